@@ -45,6 +45,38 @@ export default function HomeScreen() {
     }
   }, [api, isConfigured]);
 
+  // Long-poll the lock state while the WebSocket is disconnected
+  useEffect(() => {
+    if (!api || !isConfigured || isConnected) return;
+
+    let cancelled = false;
+    const poll = async () => {
+      while (!cancelled) {
+        const startedAt = Date.now();
+        let minInterval = 1000;
+        try {
+          const state = await api.waitForLockState(30);
+          if (!cancelled) {
+            setLockState(state);
+          }
+        } catch (error) {
+          console.log('Error polling lock state:', error);
+          minInterval = 5000;
+        }
+        // Don't spin if the server answered immediately (error or no long-poll support)
+        const elapsed = Date.now() - startedAt;
+        if (elapsed < minInterval) {
+          await new Promise((resolve) => setTimeout(resolve, minInterval - elapsed));
+        }
+      }
+    };
+    poll();
+
+    return () => {
+      cancelled = true;
+    };
+  }, [api, isConfigured, isConnected]);
+
   const fetchLockState = async () => {
     if (!api) return;
     
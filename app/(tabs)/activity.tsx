@@ -1,5 +1,5 @@
 
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useMemo } from 'react';
 import { View, Text, StyleSheet, ScrollView, RefreshControl, Alert } from 'react-native';
 import { Redirect } from 'expo-router';
 import { useAuth } from '../../src/contexts/AuthContext';
@@ -15,7 +15,10 @@ export default function ActivityScreen() {
   const [activities, setActivities] = useState<ActivityLog[]>([]);
   const [isLoading, setIsLoading] = useState(false);
   const [isRefreshing, setIsRefreshing] = useState(false);
-  const api = settings.piBaseUrl ? new LockApi(settings.piBaseUrl) : null;
+  const api = useMemo(
+    () => (settings.piBaseUrl ? new LockApi(settings.piBaseUrl) : null),
+    [settings.piBaseUrl]
+  );
 
   useEffect(() => {
     if (api && isConfigured && user) {
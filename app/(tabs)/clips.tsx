@@ -1,11 +1,11 @@
 
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useMemo } from 'react';
 import { View, Text, StyleSheet, ScrollView, TouchableOpacity, RefreshControl, Alert } from 'react-native';
 import { Redirect } from 'expo-router';
 import { useAuth } from '../../src/contexts/AuthContext';
 import { useDevice } from '../../src/contexts/DeviceContext';
 import { LockApi } from '../../src/api/lockApi';
-import { MotionClip } from '../../src/types';
+import { MotionClip, ClipTimeline } from '../../src/types';
 import { colors, commonStyles } from '../../styles/commonStyles';
 import { IconSymbol } from '../../components/IconSymbol';
 
@@ -13,9 +13,13 @@ export default function ClipsScreen() {
   const { user, isGuest, isLoading: authLoading } = useAuth();
   const { settings, isConfigured } = useDevice();
   const [clips, setClips] = useState<MotionClip[]>([]);
+  const [timelines, setTimelines] = useState<Record<string, ClipTimeline | null>>({});
   const [isLoading, setIsLoading] = useState(false);
   const [isRefreshing, setIsRefreshing] = useState(false);
-  const api = settings.piBaseUrl ? new LockApi(settings.piBaseUrl) : null;
+  const api = useMemo(
+    () => (settings.piBaseUrl ? new LockApi(settings.piBaseUrl) : null),
+    [settings.piBaseUrl]
+  );
 
   useEffect(() => {
     if (api && isConfigured && user) {
@@ -30,6 +34,14 @@ export default function ClipsScreen() {
     try {
       const fetchedClips = await api.getMotionClips();
       setClips(fetchedClips);
+
+      // Timelines are optional, so a failure here shouldn't hide the clip list
+      try {
+        const fetchedTimelines = await api.getClipTimelines(fetchedClips.map((clip) => clip.filename));
+        setTimelines(fetchedTimelines);
+      } catch (error) {
+        console.log('Error fetching clip timelines:', error);
+      }
     } catch (error) {
       console.log('Error fetching clips:', error);
       Alert.alert('Error', 'Failed to load motion clips');
@@ -133,6 +145,9 @@ export default function ClipsScreen() {
                   Duration: {clip.duration}s
                 </Text>
               </View>
+              {timelines[clip.filename] && (
+                <ActivityHeatmap timeline={timelines[clip.filename] as ClipTimeline} />
+              )}
             </TouchableOpacity>
           ))}
         </View>
@@ -141,6 +156,36 @@ export default function ClipsScreen() {
   );
 }
 
+const HEATMAP_BUCKETS = 50;
+
+function ActivityHeatmap({ timeline }: { timeline: ClipTimeline }) {
+  // Collapse samples into fixed buckets so long clips don't render hundreds of views
+  const bucketSize = Math.max(1, Math.ceil(timeline.energy.length / HEATMAP_BUCKETS));
+  const buckets: number[] = [];
+  for (let i = 0; i < timeline.energy.length; i += bucketSize) {
+    buckets.push(Math.max(...timeline.energy.slice(i, i + bucketSize)));
+  }
+  const maxEnergy = Math.max(...buckets, 1);
+
+  return (
+    <View style={styles.heatmapContainer}>
+      <View style={styles.heatmap}>
+        {buckets.map((energy, index) => (
+          <View
+            key={index}
+            style={[styles.heatmapCell, { backgroundColor: colors.primary, opacity: 0.1 + 0.9 * (energy / maxEnergy) }]}
+          />
+        ))}
+      </View>
+      {timeline.peakOffset !== null && (
+        <Text style={[commonStyles.textSecondary, { marginTop: 4 }]}>
+          Most activity at {timeline.peakOffset.toFixed(1)}s
+        </Text>
+      )}
+    </View>
+  );
+}
+
 const styles = StyleSheet.create({
   content: {
     padding: 20,
@@ -165,4 +210,16 @@ const styles = StyleSheet.create({
     justifyContent: 'space-between',
     marginTop: 8,
   },
+  heatmapContainer: {
+    marginTop: 12,
+  },
+  heatmap: {
+    flexDirection: 'row',
+    height: 12,
+    borderRadius: 4,
+    overflow: 'hidden',
+  },
+  heatmapCell: {
+    flex: 1,
+  },
 });
@@ -0,0 +1,99 @@
+
+"""
+WebSocket Protocol Benchmark
+Compares bytes on the wire and server encoding CPU per 1,000 events for
+per-client JSON (the previous send_json behaviour), shared JSON, and
+batched binary frames
+
+Usage:
+    python3 bench_ws_protocol.py --clients 5 --batch 10
+"""
+
+import argparse
+import time
+from datetime import datetime
+
+from ws_protocol import decode_binary, encode_binary, encode_json
+
+EVENTS = 1000
+
+
+def ws_frame_size(payload_length):
+    """Payload plus the server-to-client WebSocket frame header (unmasked)"""
+    if payload_length < 126:
+        return payload_length + 2
+    if payload_length < 65536:
+        return payload_length + 4
+    return payload_length + 10
+
+
+def make_events(count):
+    events = []
+    for i in range(count):
+        timestamp = datetime.now().isoformat()
+        if i % 4 == 3:
+            events.append({
+                "type": "motion_detected",
+                "timestamp": timestamp,
+                "clip": f"motion_{datetime.now():%Y%m%d_%H%M%S}.mp4",
+            })
+        else:
+            events.append({"type": "lock_state", "isLocked": i % 2 == 0, "timestamp": timestamp})
+    return events
+
+
+def bench_json_per_client(events, clients):
+    start = time.process_time()
+    wire = 0
+    for event in events:
+        for _ in range(clients):
+            wire += ws_frame_size(len(encode_json(event).encode()))
+    return wire, time.process_time() - start
+
+
+def bench_json_shared(events, clients):
+    start = time.process_time()
+    wire = 0
+    for event in events:
+        wire += clients * ws_frame_size(len(encode_json(event).encode()))
+    return wire, time.process_time() - start
+
+
+def bench_binary(events, clients, batch):
+    start = time.process_time()
+    wire = 0
+    for i in range(0, len(events), batch):
+        wire += clients * ws_frame_size(len(encode_binary(events[i:i + batch])))
+    return wire, time.process_time() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=5, help="Connected clients")
+    parser.add_argument("--batch", type=int, default=10, help="Events per binary flush window")
+    parser.add_argument("--rounds", type=int, default=20, help="Repetitions to average CPU time")
+    args = parser.parse_args()
+
+    events = make_events(EVENTS)
+    assert [e["type"] for e in decode_binary(encode_binary(events))] == [e["type"] for e in events]
+
+    modes = [
+        ("json (per client)", lambda: bench_json_per_client(events, args.clients)),
+        ("json (shared)", lambda: bench_json_shared(events, args.clients)),
+        (f"binary (batch {args.batch})", lambda: bench_binary(events, args.clients, args.batch)),
+    ]
+
+    print(f"{EVENTS} events, {args.clients} clients")
+    print(f"{'mode':<20} {'wire bytes':>12} {'bytes/event':>12} {'cpu ms':>10}")
+    for name, run in modes:
+        wire = 0
+        cpu = 0.0
+        for _ in range(args.rounds):
+            wire, seconds = run()
+            cpu += seconds
+        print(f"{name:<20} {wire:>12} {wire / EVENTS / args.clients:>12.1f} "
+              f"{1000 * cpu / args.rounds:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
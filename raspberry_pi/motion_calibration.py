@@ -0,0 +1,165 @@
+
+"""
+Motion Threshold Auto-Calibration
+Tracks rolling noise statistics of the thresholded frame delta and adapts
+the motion threshold and minimum area, with separate day and night profiles
+"""
+
+import numpy as np
+
+# Resolution the min-area bounds are expressed in
+REFERENCE_AREA = 640 * 480
+
+
+class CalibrationProfile:
+    def __init__(self, name, threshold_bounds, min_area_bounds):
+        """
+        Calibration state for one lighting condition
+
+        Args:
+            name: Profile name ("day" or "night")
+            threshold_bounds: (min, max) pixel difference threshold
+            min_area_bounds: (min, max) contour area at 640x480
+        """
+        self.name = name
+        self.threshold_bounds = threshold_bounds
+        self.min_area_bounds = min_area_bounds
+        self.noise_level = None
+        self.noise_area = 0.0
+        self.samples = 0
+
+
+# Floors match the fixed defaults (threshold 25, min area 500), so calibration
+# only ever makes detection less sensitive than an uncalibrated detector
+DEFAULT_PROFILES = {
+    "day": ((25, 60), (500, 6000)),
+    # Night frames carry more sensor noise, so allow a higher floor
+    "night": ((30, 80), (800, 8000)),
+}
+
+
+class MotionCalibrator:
+    def __init__(self, profiles=None, percentile=99.5, threshold_margin=1.5, area_margin=2.0,
+                 alpha=0.02, motion_weight=0.25, warmup_frames=20, night_brightness=50,
+                 brightness_hysteresis=8, sample_step=2):
+        """
+        Initialize calibrator
+
+        Args:
+            profiles: {name: (threshold_bounds, min_area_bounds)} for "day" and "night"
+            percentile: Percentile of the frame delta tracked as the noise level
+            threshold_margin: Threshold is this multiple of the noise level
+            area_margin: Min area is this multiple of the largest noise contour
+            alpha: Weight of each new frame in the rolling statistics
+            motion_weight: Fraction of alpha applied to frames that triggered
+            warmup_frames: Frames observed before a profile's values are applied
+            night_brightness: Mean brightness (0-255) below which the night profile is used
+            brightness_hysteresis: Brightness margin before switching back
+            sample_step: Pixel stride when sampling the (already blurred) delta
+        """
+        profiles = profiles or DEFAULT_PROFILES
+        self.profiles = {
+            name: CalibrationProfile(name, thresholds, areas)
+            for name, (thresholds, areas) in profiles.items()
+        }
+        self.percentile = percentile
+        self.threshold_margin = threshold_margin
+        self.area_margin = area_margin
+        self.alpha = alpha
+        self.motion_weight = motion_weight
+        self.warmup_frames = warmup_frames
+        self.night_brightness = night_brightness
+        self.brightness_hysteresis = brightness_hysteresis
+        self.sample_step = sample_step
+        self.brightness = None
+        self.active = self.profiles["day"]
+
+    def _select_profile(self, brightness):
+        if self.brightness is None:
+            self.brightness = brightness
+        else:
+            self.brightness += self.alpha * (brightness - self.brightness)
+
+        if self.active.name == "day" and self.brightness < self.night_brightness:
+            self.active = self.profiles["night"]
+            print(f"Motion calibration switched to night profile (brightness {self.brightness:.0f})")
+        elif (self.active.name == "night"
+              and self.brightness > self.night_brightness + self.brightness_hysteresis):
+            self.active = self.profiles["day"]
+            print(f"Motion calibration switched to day profile (brightness {self.brightness:.0f})")
+
+    def observe(self, frame_delta, frame, largest_area, motion):
+        """
+        Update noise statistics from the delta the detector just thresholded
+
+        The noise level is a high percentile of the delta rather than its
+        median, so localized noise such as rain on part of the lens still
+        registers. The noise area is the largest contour found at the current
+        threshold, measured exactly as the detector measures motion. Triggered
+        frames still count, at a reduced weight, so persistent noise is
+        learned instead of triggering forever.
+
+        Args:
+            frame_delta: Absolute difference image passed to cv2.threshold
+            frame: Current blurred grayscale frame (for brightness)
+            largest_area: Area of the largest contour found in the delta (0 if none)
+            motion: Whether the detector triggered on this frame
+        """
+        step = self.sample_step
+        self._select_profile(float(frame[::step, ::step].mean()))
+
+        sample = frame_delta[::step, ::step].astype(np.float32)
+        level = float(np.percentile(sample, self.percentile))
+        area = float(largest_area)
+
+        profile = self.active
+        if profile.noise_level is None:
+            profile.noise_level = level
+            profile.noise_area = area
+        else:
+            alpha = self.alpha * (self.motion_weight if motion else 1.0)
+            profile.noise_level += alpha * (level - profile.noise_level)
+            profile.noise_area += alpha * (area - profile.noise_area)
+        profile.samples += 1
+
+    def calibrated_values(self, frame_area, threshold, min_area):
+        """
+        Get (threshold, min_area) for the active profile
+
+        Args:
+            frame_area: Pixel count of the frame the detector thresholds
+            threshold: Value to keep while the profile is still warming up
+            min_area: Value to keep while the profile is still warming up
+        """
+        profile = self.active
+        if profile.samples < self.warmup_frames:
+            return threshold, min_area
+
+        low, high = profile.threshold_bounds
+        threshold = self.threshold_margin * profile.noise_level
+        threshold = int(round(min(max(threshold, low), high)))
+
+        # Bounds are expressed at 640x480; scale them to the actual resolution
+        scale = frame_area / REFERENCE_AREA
+        low, high = (bound * scale for bound in profile.min_area_bounds)
+        min_area = self.area_margin * profile.noise_area
+        min_area = int(round(min(max(min_area, low), high)))
+
+        return threshold, min_area
+
+    def get_state(self):
+        """Get calibration state for the API"""
+        return {
+            "profile": self.active.name,
+            "brightness": round(self.brightness, 1) if self.brightness is not None else None,
+            "profiles": {
+                name: {
+                    "noiseLevel": round(p.noise_level, 2) if p.noise_level is not None else None,
+                    "noiseArea": round(p.noise_area, 1),
+                    "samples": p.samples,
+                    "thresholdBounds": list(p.threshold_bounds),
+                    "minAreaBounds": list(p.min_area_bounds),
+                }
+                for name, p in self.profiles.items()
+            },
+        }
@@ -10,6 +10,10 @@ from datetime import datetime
 from pathlib import Path
 import time
 
+from motion_calibration import MotionCalibrator
+from motion_timeline import MotionTimeline, timeline_path_for
+from storage_writer import BackgroundWriter
+
 try:
     from picamera2 import Picamera2
     from picamera2.encoders import H264Encoder
@@ -20,23 +24,35 @@ except ImportError:
     PICAMERA_AVAILABLE = False
 
 class MotionDetector:
-    def __init__(self, threshold=25, min_area=500):
+    def __init__(self, threshold=25, min_area=500, timeline_interval=0.1, analysis_size=(160, 120),
+                 auto_calibrate=False, calibrator=None, use_camera=True, writer=None):
         """
         Initialize motion detector
         
         Args:
             threshold: Pixel difference threshold for motion detection
             min_area: Minimum contour area to consider as motion
+            timeline_interval: Seconds between activity timeline samples while recording
+            analysis_size: Downsampled (width, height) used for activity analysis
+            auto_calibrate: Adapt threshold and min_area to measured frame noise
+            calibrator: MotionCalibrator to use (default settings if None)
+            use_camera: Open the Pi Camera (False to only process supplied frames)
+            writer: Shared BackgroundWriter for clips (a private one is created if None)
         """
         self.threshold = threshold
         self.min_area = min_area
+        self.timeline_interval = timeline_interval
+        self.analysis_size = analysis_size
+        self.calibrator = (calibrator or MotionCalibrator()) if auto_calibrate else None
         self.previous_frame = None
         self.motion_detected = False
         self.clips_dir = Path("clips")
         self.clips_dir.mkdir(exist_ok=True)
+        self.owns_writer = writer is None
+        self.writer = writer or BackgroundWriter()
         self.camera = None
         
-        if PICAMERA_AVAILABLE:
+        if PICAMERA_AVAILABLE and use_camera:
             try:
                 # Initialize camera for motion detection
                 self.camera = Picamera2()
@@ -74,42 +90,58 @@ class MotionDetector:
         try:
             # Capture frame
             frame = self.camera.capture_array()
-            
-            # Convert to grayscale
-            gray = cv2.cvtColor(frame, cv2.COLOR_RGB2GRAY)
-            gray = cv2.GaussianBlur(gray, (21, 21), 0)
-            
-            # Initialize previous frame
-            if self.previous_frame is None:
-                self.previous_frame = gray
-                return False
-            
-            # Compute difference between frames
-            frame_delta = cv2.absdiff(self.previous_frame, gray)
-            thresh = cv2.threshold(frame_delta, self.threshold, 255, cv2.THRESH_BINARY)[1]
-            
-            # Dilate threshold image to fill holes
-            thresh = cv2.dilate(thresh, None, iterations=2)
-            
-            # Find contours
-            contours, _ = cv2.findContours(thresh.copy(), cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-            
-            # Check if any contour is large enough
-            motion = False
-            for contour in contours:
-                if cv2.contourArea(contour) > self.min_area:
-                    motion = True
-                    break
-            
-            # Update previous frame
-            self.previous_frame = gray
-            
-            return motion
+            return self.process_frame(frame)
         
         except Exception as e:
             print(f"Error detecting motion: {e}")
             return False
     
+    def process_frame(self, frame):
+        """
+        Run motion detection on a single RGB frame
+        
+        Args:
+            frame: RGB image array
+        
+        Returns:
+            bool: True if motion detected, False otherwise
+        """
+        # Convert to grayscale
+        gray = cv2.cvtColor(frame, cv2.COLOR_RGB2GRAY)
+        gray = cv2.GaussianBlur(gray, (21, 21), 0)
+        
+        # Initialize previous frame (again if the resolution changed)
+        if self.previous_frame is None or self.previous_frame.shape != gray.shape:
+            self.previous_frame = gray
+            return False
+        
+        # Compute difference between frames
+        frame_delta = cv2.absdiff(self.previous_frame, gray)
+        thresh = cv2.threshold(frame_delta, self.threshold, 255, cv2.THRESH_BINARY)[1]
+        
+        # Dilate threshold image to fill holes
+        thresh = cv2.dilate(thresh, None, iterations=2)
+        
+        # Find contours
+        contours, _ = cv2.findContours(thresh.copy(), cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        
+        # Check if any contour is large enough
+        largest_area = max((cv2.contourArea(contour) for contour in contours), default=0)
+        motion = largest_area > self.min_area
+        
+        # Update noise statistics from this same delta and apply calibrated
+        # values for the next frame
+        if self.calibrator:
+            self.calibrator.observe(frame_delta, gray, largest_area, motion)
+            self.threshold, self.min_area = self.calibrator.calibrated_values(
+                gray.size, self.threshold, self.min_area
+            )
+        
+        # Update previous frame
+        self.previous_frame = gray
+        
+        return motion
+    
     def record_clip(self, duration=10):
         """
         Record a video clip
@@ -127,9 +159,13 @@ class MotionDetector:
         if not PICAMERA_AVAILABLE or self.camera is None:
             # Simulation mode - create dummy file
             print(f"Simulating clip recording: {filename}")
-            filepath.touch()
+            self.writer.write_file(filepath, b"")
+            self.writer.write_file(timeline_path_for(filepath), self._simulate_timeline(duration).to_bytes())
             return filename
         
+        # Stage the clip in RAM; it appears in clips/ only once fully written
+        staged = self.writer.open(filepath)
+        
         try:
             print(f"Recording clip: {filename}")
             
@@ -146,16 +182,18 @@ class MotionDetector:
             
             # Setup encoder
             encoder = H264Encoder(bitrate=10000000)
-            output = FileOutput(str(filepath))
+            output = FileOutput(staged)
             
             # Start recording
             self.camera.start_recording(encoder, output)
             
-            # Record for specified duration
-            time.sleep(duration)
+            # Record for specified duration, sampling motion activity as we go
+            timeline = self._record_timeline(duration)
             
             # Stop recording
             self.camera.stop_recording()
+            staged.close()
+            self.writer.write_file(timeline_path_for(filepath), timeline.to_bytes())
             
             # Restart camera for motion detection if it was running
             if was_running:
@@ -172,6 +210,8 @@ class MotionDetector:
         
         except Exception as e:
             print(f"Error recording clip: {e}")
+            # Keep whatever was recorded
+            staged.close()
             # Ensure camera is restarted
             try:
                 if not self.camera.started:
@@ -185,6 +225,89 @@ class MotionDetector:
             
             return filename
     
+    def _downsample(self, frame):
+        """Convert a captured frame to a small blurred grayscale image"""
+        gray = cv2.cvtColor(frame, cv2.COLOR_RGB2GRAY)
+        small = cv2.resize(gray, self.analysis_size, interpolation=cv2.INTER_AREA)
+        return cv2.GaussianBlur(small, (5, 5), 0)
+    
+    def get_calibration(self):
+        """Get the current motion thresholds and calibration state"""
+        state = {
+            "autoCalibrate": self.calibrator is not None,
+            "threshold": self.threshold,
+            "minArea": self.min_area,
+        }
+        if self.calibrator:
+            state.update(self.calibrator.get_state())
+        return state
+    
+    def _measure_activity(self, previous, current):
+        """
+        Measure motion between two downsampled frames
+        
+        Returns:
+            tuple: (energy, box) where energy is the mean absolute delta and
+            box is the normalized (x, y, w, h) of changed pixels, or None
+        """
+        delta = cv2.absdiff(previous, current)
+        energy = float(delta.mean())
+        
+        mask = delta > self.threshold
+        rows = np.flatnonzero(mask.any(axis=1))
+        if rows.size == 0:
+            return energy, None
+        cols = np.flatnonzero(mask.any(axis=0))
+        
+        height, width = mask.shape
+        box = (
+            cols[0] / width,
+            rows[0] / height,
+            (cols[-1] - cols[0] + 1) / width,
+            (rows[-1] - rows[0] + 1) / height,
+        )
+        return energy, box
+    
+    def _record_timeline(self, duration):
+        """Sample motion activity from the camera for the duration of a recording"""
+        timeline = MotionTimeline(interval=self.timeline_interval)
+        previous = None
+        start = time.monotonic()
+        
+        for sample in range(int(duration / self.timeline_interval)):
+            try:
+                current = self._downsample(self.camera.capture_array())
+                if previous is None:
+                    timeline.append(0)
+                else:
+                    timeline.append(*self._measure_activity(previous, current))
+                previous = current
+            except Exception as e:
+                print(f"Error sampling motion timeline: {e}")
+                timeline.append(0)
+            
+            # Sleep until the next sample slot so the timeline stays on a fixed grid
+            next_sample = start + (sample + 1) * self.timeline_interval
+            time.sleep(max(0, next_sample - time.monotonic()))
+        
+        return timeline
+    
+    def _simulate_timeline(self, duration):
+        """Create a synthetic activity timeline for simulation mode"""
+        import random
+        timeline = MotionTimeline(interval=self.timeline_interval)
+        samples = int(duration / self.timeline_interval)
+        peak = random.randrange(max(samples, 1))
+        for sample in range(samples):
+            distance = abs(sample - peak) / max(samples, 1)
+            energy = max(0.0, 20 * (1 - 4 * distance)) + random.random()
+            if energy > 2:
+                # Box drifts left to right as the simulated visitor walks past
+                timeline.append(energy, (0.2 + 0.6 * sample / max(samples, 1), 0.25, 0.2, 0.5))
+            else:
+                timeline.append(energy)
+        return timeline
+    
     def cleanup(self):
         """Cleanup resources"""
         print("Cleaning up motion detector...")
@@ -195,6 +318,9 @@ class MotionDetector:
                 self.camera.close()
             except Exception as e:
                 print(f"Error cleaning up motion detector: {e}")
+        
+        if self.owns_writer:
+            self.writer.cleanup()
 
 # Example usage
 if __name__ == "__main__":
@@ -0,0 +1,115 @@
+
+"""
+Motion Activity Timeline
+Compact per-clip track of motion energy and bounding boxes for fast scrubbing
+"""
+
+import struct
+import sys
+from array import array
+from pathlib import Path
+
+# File layout: header, then `count` energy values, then `count` boxes (x, y, w, h)
+TIMELINE_MAGIC = b"SLMT"
+TIMELINE_VERSION = 1
+TIMELINE_HEADER = struct.Struct("<4sHHI")
+TIMELINE_SUFFIX = ".timeline"
+
+# Energy is mean absolute pixel delta (0-255) stored in hundredths
+ENERGY_SCALE = 100
+# Box coordinates are stored as fractions of the frame size
+BOX_SCALE = 65535
+
+
+def timeline_path_for(clip_path):
+    """Get the timeline file stored next to a clip"""
+    return Path(clip_path).with_suffix(TIMELINE_SUFFIX)
+
+
+class MotionTimeline:
+    def __init__(self, interval=0.1):
+        """
+        Initialize an empty timeline
+
+        Args:
+            interval: Seconds between samples
+        """
+        self.interval = interval
+        self.energy = array("H")
+        self.boxes = array("H")
+
+    def __len__(self):
+        return len(self.energy)
+
+    def append(self, energy, box=None):
+        """
+        Append one sample
+
+        Args:
+            energy: Mean absolute frame delta (0-255)
+            box: Normalized (x, y, w, h) of the moving region, or None
+        """
+        self.energy.append(min(int(round(energy * ENERGY_SCALE)), 0xFFFF))
+        if box is None:
+            self.boxes.extend((0, 0, 0, 0))
+        else:
+            self.boxes.extend(
+                min(max(int(round(v * BOX_SCALE)), 0), BOX_SCALE) for v in box
+            )
+
+    def peak_offset(self):
+        """Get the clip offset in seconds with the most motion, or None"""
+        if not self.energy or max(self.energy) == 0:
+            return None
+        return round(self.energy.index(max(self.energy)) * self.interval, 2)
+
+    def to_bytes(self):
+        """Serialize to the on-disk format"""
+        energy = array("H", self.energy)
+        boxes = array("H", self.boxes)
+        if sys.byteorder == "big":
+            energy.byteswap()
+            boxes.byteswap()
+
+        header = TIMELINE_HEADER.pack(
+            TIMELINE_MAGIC, TIMELINE_VERSION, int(self.interval * 1000), len(energy)
+        )
+        return header + energy.tobytes() + boxes.tobytes()
+
+    @classmethod
+    def load(cls, path):
+        """Read a timeline from disk, or None if missing or unreadable"""
+        try:
+            data = Path(path).read_bytes()
+            magic, version, interval_ms, count = TIMELINE_HEADER.unpack_from(data, 0)
+            if magic != TIMELINE_MAGIC or version != TIMELINE_VERSION:
+                return None
+
+            offset = TIMELINE_HEADER.size
+            timeline = cls(interval=interval_ms / 1000)
+            timeline.energy.frombytes(data[offset:offset + count * 2])
+            offset += count * 2
+            timeline.boxes.frombytes(data[offset:offset + count * 8])
+            if sys.byteorder == "big":
+                timeline.energy.byteswap()
+                timeline.boxes.byteswap()
+            return timeline
+        except (OSError, ValueError, struct.error):
+            return None
+
+    def to_dict(self):
+        """Serialize for the API"""
+        boxes = []
+        for i in range(0, len(self.boxes), 4):
+            x, y, w, h = self.boxes[i:i + 4]
+            if w == 0 or h == 0:
+                boxes.append(None)
+            else:
+                boxes.append([round(v / BOX_SCALE, 3) for v in (x, y, w, h)])
+
+        return {
+            "interval": self.interval,
+            "energy": [round(e / ENERGY_SCALE, 2) for e in self.energy],
+            "boxes": boxes,
+            "peakOffset": self.peak_offset(),
+        }
@@ -4,7 +4,16 @@ GPIO Motor Control for Smart Lock
 Controls a servo motor or DC motor to lock/unlock the door
 """
 
+import threading
 import time
+from collections import deque
+from datetime import datetime
+
+try:
+    import pigpio
+    PIGPIO_AVAILABLE = True
+except ImportError:
+    PIGPIO_AVAILABLE = False
 
 try:
     import RPi.GPIO as GPIO
@@ -13,98 +22,412 @@ except ImportError:
     print("RPi.GPIO not available. Running in simulation mode.")
     GPIO_AVAILABLE = False
 
+# Servo pulse period at 50Hz
+SERVO_PERIOD_US = 20000
+
+LOCKED = "locked"
+UNLOCKED = "unlocked"
+
+
+class MotionProfile:
+    def __init__(self, locked_pulse_us=500, unlocked_pulse_us=1500, travel_time=0.5,
+                 ramp_time=0.0, hold_time=0.0):
+        """
+        Servo motion profile
+
+        Args:
+            locked_pulse_us: Pulse width for the locked position (500us = 0 degrees)
+            unlocked_pulse_us: Pulse width for the unlocked position (1500us = 90 degrees)
+            travel_time: Maximum time to wait for the bolt to arrive
+            ramp_time: Time to sweep the pulse width to the target (0 = jump)
+            hold_time: Time to keep driving the servo after arrival
+        """
+        self.locked_pulse_us = locked_pulse_us
+        self.unlocked_pulse_us = unlocked_pulse_us
+        self.travel_time = travel_time
+        self.ramp_time = ramp_time
+        self.hold_time = hold_time
+
+    def pulse_for(self, position):
+        return self.locked_pulse_us if position == LOCKED else self.unlocked_pulse_us
+
+
+MOTION_PROFILES = {
+    "default": MotionProfile(),
+    # Slower sweep for quieter operation at night
+    "quiet": MotionProfile(travel_time=1.2, ramp_time=0.8),
+    # Keep torque on briefly after arrival for stiff bolts
+    "firm": MotionProfile(travel_time=0.6, hold_time=0.2),
+}
+
+
+class MotorBackend:
+    """Base class for servo drivers"""
+
+    name = "base"
+    # Seconds between position feedback reads while waiting for arrival
+    poll_interval = 0.002
+
+    def __init__(self, locked_sensor_pin=None, unlocked_sensor_pin=None):
+        self.locked_sensor_pin = locked_sensor_pin
+        self.unlocked_sensor_pin = unlocked_sensor_pin
+
+    @property
+    def has_feedback(self):
+        return self.locked_sensor_pin is not None or self.unlocked_sensor_pin is not None
+
+    def can_sense(self, position):
+        """Whether a sensor is wired at `position` to confirm arrival there"""
+        pin = self.locked_sensor_pin if position == LOCKED else self.unlocked_sensor_pin
+        return pin is not None
+
+    def set_pulse_width(self, pulse_us):
+        raise NotImplementedError
+
+    def stop_pulses(self):
+        raise NotImplementedError
+
+    def read_sensor(self, pin):
+        """Read a position sensor (True when the bolt is at that sensor)"""
+        raise NotImplementedError
+
+    def read_position(self):
+        """
+        Read the bolt position from feedback sensors
+
+        Returns:
+            str: LOCKED, UNLOCKED, or None if between positions or unknown.
+            A sensor only reports its own position: with a single sensor,
+            leaving it does not mean the bolt reached the other end.
+        """
+        if self.locked_sensor_pin is not None and self.read_sensor(self.locked_sensor_pin):
+            return LOCKED
+        if self.unlocked_sensor_pin is not None and self.read_sensor(self.unlocked_sensor_pin):
+            return UNLOCKED
+        return None
+
+    def wait_for_position(self, position, timeout):
+        """
+        Wait until feedback reports the bolt at `position`
+
+        Returns:
+            bool: True if the position was reached before the timeout
+        """
+        deadline = time.perf_counter() + timeout
+        while time.perf_counter() < deadline:
+            if self.read_position() == position:
+                return True
+            time.sleep(self.poll_interval)
+        return self.read_position() == position
+
+    def cleanup(self):
+        pass
+
+
+class PigpioServoBackend(MotorBackend):
+    """DMA-timed servo pulses via the pigpio daemon (no CPU jitter)"""
+
+    name = "pigpio"
+
+    def __init__(self, pin, locked_sensor_pin=None, unlocked_sensor_pin=None):
+        super().__init__(locked_sensor_pin, unlocked_sensor_pin)
+        self.pin = pin
+        self.pi = pigpio.pi()
+        if not self.pi.connected:
+            raise RuntimeError("pigpio daemon not running (start it with: sudo pigpiod)")
+
+        self.pi.set_mode(self.pin, pigpio.OUTPUT)
+        for sensor_pin in (locked_sensor_pin, unlocked_sensor_pin):
+            if sensor_pin is not None:
+                self.pi.set_mode(sensor_pin, pigpio.INPUT)
+                self.pi.set_pull_up_down(sensor_pin, pigpio.PUD_UP)
+
+    def set_pulse_width(self, pulse_us):
+        self.pi.set_servo_pulsewidth(self.pin, pulse_us)
+
+    def stop_pulses(self):
+        self.pi.set_servo_pulsewidth(self.pin, 0)
+
+    def read_sensor(self, pin):
+        # Sensors are wired active low against the internal pull-up
+        return self.pi.read(pin) == 0
+
+    def cleanup(self):
+        self.stop_pulses()
+        self.pi.stop()
+
+
+class RPiGPIOBackend(MotorBackend):
+    """Software PWM via RPi.GPIO (fallback when pigpio is unavailable)"""
+
+    name = "rpi_gpio"
+
+    def __init__(self, pin, locked_sensor_pin=None, unlocked_sensor_pin=None):
+        super().__init__(locked_sensor_pin, unlocked_sensor_pin)
+        self.pin = pin
+
+        GPIO.setmode(GPIO.BCM)
+        GPIO.setup(self.pin, GPIO.OUT)
+        for sensor_pin in (locked_sensor_pin, unlocked_sensor_pin):
+            if sensor_pin is not None:
+                GPIO.setup(sensor_pin, GPIO.IN, pull_up_down=GPIO.PUD_UP)
+
+        # Setup PWM for servo control (50Hz)
+        self.pwm = GPIO.PWM(self.pin, 1000000 // SERVO_PERIOD_US)
+        self.pwm.start(0)
+
+    def set_pulse_width(self, pulse_us):
+        self.pwm.ChangeDutyCycle(pulse_us * 100 / SERVO_PERIOD_US)
+
+    def stop_pulses(self):
+        self.pwm.ChangeDutyCycle(0)  # Stop sending signal
+
+    def read_sensor(self, pin):
+        return GPIO.input(pin) == GPIO.LOW
+
+    def cleanup(self):
+        self.pwm.stop()
+        GPIO.cleanup()
+
+
+class SimulatedServoBackend(MotorBackend):
+    """Models servo travel time so actuation latency can be measured without a Pi"""
+
+    name = "simulated"
+
+    def __init__(self, profile, seconds_per_60_degrees=0.12, start_pulse_us=None,
+                 sensors=(LOCKED, UNLOCKED)):
+        """
+        Args:
+            profile: MotionProfile used to place the simulated position sensors
+            seconds_per_60_degrees: Servo speed (datasheet rating under load)
+            start_pulse_us: Initial simulated position (defaults to locked)
+            sensors: Positions that have a simulated sensor
+        """
+        # Virtual sensors at the end positions, keyed by position name
+        super().__init__(
+            locked_sensor_pin=LOCKED if LOCKED in sensors else None,
+            unlocked_sensor_pin=UNLOCKED if UNLOCKED in sensors else None,
+        )
+        self.profile = profile
+        # 1000us of pulse width spans 90 degrees on a standard servo
+        self.us_per_second = (60 / seconds_per_60_degrees) * (1000 / 90)
+        self.position_us = profile.locked_pulse_us if start_pulse_us is None else start_pulse_us
+        self.target_us = None
+        self.command_time = time.perf_counter()
+
+    def _current_position(self):
+        if self.target_us is None:
+            return self.position_us
+        elapsed = time.perf_counter() - self.command_time
+        travel = self.us_per_second * elapsed
+        if abs(self.target_us - self.position_us) <= travel:
+            return self.target_us
+        direction = 1 if self.target_us > self.position_us else -1
+        return self.position_us + direction * travel
+
+    def set_pulse_width(self, pulse_us):
+        self.position_us = self._current_position()
+        self.target_us = pulse_us
+        self.command_time = time.perf_counter()
+
+    def stop_pulses(self):
+        # An unpowered servo stays where it is
+        self.position_us = self._current_position()
+        self.target_us = None
+
+    def read_sensor(self, pin):
+        position = self._current_position()
+        return abs(position - self.profile.pulse_for(pin)) < 10
+
+
+def create_backend(name, pin, profile, locked_sensor_pin=None, unlocked_sensor_pin=None):
+    """
+    Create a motor backend by name
+
+    Args:
+        name: "pigpio", "rpi_gpio", "simulated", or None to pick the best available
+    """
+    if name in (None, "pigpio") and PIGPIO_AVAILABLE:
+        try:
+            return PigpioServoBackend(pin, locked_sensor_pin, unlocked_sensor_pin)
+        except Exception as e:
+            if name == "pigpio":
+                raise
+            print(f"pigpio unavailable ({e}), falling back")
+
+    if name in (None, "rpi_gpio") and GPIO_AVAILABLE:
+        return RPiGPIOBackend(pin, locked_sensor_pin, unlocked_sensor_pin)
+
+    if name not in (None, "simulated"):
+        raise RuntimeError(f"Motor backend '{name}' is not available")
+
+    return SimulatedServoBackend(profile)
+
+
 class LockMotor:
-    def __init__(self, pin=18):
+    def __init__(self, pin=18, backend=None, profile="default", locked_sensor_pin=None,
+                 unlocked_sensor_pin=None, metrics_size=100):
         """
         Initialize the lock motor controller
-        
+
         Args:
             pin: GPIO pin number for motor control (default: 18)
+            backend: MotorBackend instance, backend name, or None to auto-detect
+            profile: MotionProfile instance or name from MOTION_PROFILES
+            locked_sensor_pin: Optional GPIO input that reads low when the bolt is locked
+            unlocked_sensor_pin: Optional GPIO input that reads low when the bolt is unlocked
+            metrics_size: Number of recent actuations kept for metrics
         """
         self.pin = pin
+        self.profile = MOTION_PROFILES[profile] if isinstance(profile, str) else profile
         self.is_locked = True
-        
-        if GPIO_AVAILABLE:
-            # Setup GPIO
-            GPIO.setmode(GPIO.BCM)
-            GPIO.setup(self.pin, GPIO.OUT)
-            
-            # Setup PWM for servo control (50Hz)
-            self.pwm = GPIO.PWM(self.pin, 50)
-            self.pwm.start(0)
-            
-            # Initialize to locked position
-            self._move_to_locked_position()
+        self.position_confirmed = False
+        self.actuations = deque(maxlen=metrics_size)
+        self.total_actuations = 0
+        self.failed_actuations = 0
+        self.move_lock = threading.Lock()
+
+        if isinstance(backend, MotorBackend):
+            self.backend = backend
         else:
-            print("Motor initialized in simulation mode")
-    
+            self.backend = create_backend(
+                backend, pin, self.profile, locked_sensor_pin, unlocked_sensor_pin
+            )
+
+        print(f"Motor initialized with {self.backend.name} backend")
+
+        # Initialize to locked position
+        self._move(LOCKED)
+
     def lock(self):
         """Lock the door"""
         print("Locking door...")
-        
-        if GPIO_AVAILABLE:
-            self._move_to_locked_position()
-        else:
-            # Simulation
-            time.sleep(0.5)
-        
-        self.is_locked = True
-        print("Door locked")
-    
+        self._move(LOCKED)
+        print("Door locked" if self.is_locked else "Door failed to lock")
+
     def unlock(self):
         """Unlock the door"""
         print("Unlocking door...")
-        
-        if GPIO_AVAILABLE:
-            self._move_to_unlocked_position()
-        else:
-            # Simulation
-            time.sleep(0.5)
-        
-        self.is_locked = False
-        print("Door unlocked")
-    
-    def _move_to_locked_position(self):
-        """Move servo to locked position (0 degrees)"""
-        if GPIO_AVAILABLE:
-            # 0 degrees = 2.5% duty cycle
-            self.pwm.ChangeDutyCycle(2.5)
-            time.sleep(0.5)
-            self.pwm.ChangeDutyCycle(0)  # Stop sending signal
-    
-    def _move_to_unlocked_position(self):
-        """Move servo to unlocked position (90 degrees)"""
-        if GPIO_AVAILABLE:
-            # 90 degrees = 7.5% duty cycle
-            self.pwm.ChangeDutyCycle(7.5)
-            time.sleep(0.5)
-            self.pwm.ChangeDutyCycle(0)  # Stop sending signal
-    
+        self._move(UNLOCKED)
+        print("Door unlocked" if not self.is_locked else "Door failed to unlock")
+
+    def _move(self, position):
+        """
+        Drive the servo to `position` and record actuation timing
+
+        With a sensor at the target the move finishes as soon as the bolt
+        arrives; without one we wait the profile's full travel time and
+        assume success.
+        """
+        with self.move_lock:
+            target = self.profile.pulse_for(position)
+            start = time.perf_counter()
+
+            if self.profile.ramp_time > 0:
+                self._ramp_to(target)
+            self.backend.set_pulse_width(target)
+
+            if self.backend.can_sense(position):
+                confirmed = self.backend.wait_for_position(position, self.profile.travel_time)
+            else:
+                time.sleep(self.profile.travel_time)
+                confirmed = None
+            arrived = time.perf_counter()
+
+            if self.profile.hold_time > 0:
+                time.sleep(self.profile.hold_time)
+            self.backend.stop_pulses()
+
+            if confirmed is False:
+                # Trust the sensors over the command
+                actual = self.backend.read_position()
+                self.is_locked = actual == LOCKED if actual else self.is_locked
+                self.failed_actuations += 1
+                print(f"Warning: bolt did not reach {position} position within "
+                      f"{self.profile.travel_time}s")
+            else:
+                self.is_locked = position == LOCKED
+            self.position_confirmed = bool(confirmed)
+
+            self.total_actuations += 1
+            self.actuations.append({
+                "action": position,
+                "timestamp": datetime.now().isoformat(),
+                "durationMs": round((arrived - start) * 1000, 2),
+                "totalMs": round((time.perf_counter() - start) * 1000, 2),
+                "confirmed": confirmed,
+            })
+
+    def _ramp_to(self, target):
+        """Sweep the pulse width from the current position to the target"""
+        start_pulse = self.profile.pulse_for(LOCKED if self.is_locked else UNLOCKED)
+        steps = max(int(self.profile.ramp_time / 0.02), 1)  # One step per servo period
+        for step in range(1, steps + 1):
+            self.backend.set_pulse_width(start_pulse + (target - start_pulse) * step / steps)
+            time.sleep(self.profile.ramp_time / steps)
+
     def get_state(self):
         """Get current lock state"""
         return self.is_locked
-    
+
+    def get_metrics(self):
+        """Get actuation timing metrics"""
+        # Moves append from a worker thread; copy once (a single C-level call)
+        # so iterating can't hit a deque mutated mid-loop
+        recent = list(self.actuations)
+        durations = sorted(a["durationMs"] for a in recent)
+        summary = {
+            "backend": self.backend.name,
+            "hasFeedback": self.backend.has_feedback,
+            "positionConfirmed": self.position_confirmed,
+            "totalActuations": self.total_actuations,
+            "failedActuations": self.failed_actuations,
+            "recent": recent,
+        }
+        if durations:
+            summary.update({
+                "meanMs": round(sum(durations) / len(durations), 2),
+                "p95Ms": durations[min(int(len(durations) * 0.95), len(durations) - 1)],
+                "maxMs": durations[-1],
+            })
+        return summary
+
     def cleanup(self):
         """Cleanup GPIO resources"""
         print("Cleaning up motor GPIO...")
-        if GPIO_AVAILABLE:
-            self.pwm.stop()
-            GPIO.cleanup()
+        self.backend.cleanup()
 
 # Example usage
 if __name__ == "__main__":
+    import sys
+
+    if "--benchmark" in sys.argv:
+        # Compare actuation latency of each profile against the simulated servo
+        for name, profile in MOTION_PROFILES.items():
+            motor = LockMotor(backend=SimulatedServoBackend(profile), profile=profile)
+            for _ in range(20):
+                motor.unlock()
+                motor.lock()
+            metrics = motor.get_metrics()
+            print(f"{name}: mean {metrics['meanMs']}ms, p95 {metrics['p95Ms']}ms, "
+                  f"max {metrics['maxMs']}ms over {metrics['totalActuations']} moves")
+            motor.cleanup()
+        sys.exit(0)
+
     motor = LockMotor()
-    
+
     try:
         print("Testing lock motor...")
-        
+
         motor.unlock()
         time.sleep(2)
-        
+
         motor.lock()
         time.sleep(2)
-        
+
+        print(motor.get_metrics())
         print("Test complete")
-    
+
     finally:
         motor.cleanup()
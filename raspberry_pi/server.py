@@ -1,9 +1,9 @@
 
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException
-from fastapi.responses import StreamingResponse, FileResponse
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, Request
+from fastapi.responses import StreamingResponse, FileResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Dict, List, Optional
 from contextlib import asynccontextmanager
 import json
 import asyncio
@@ -15,34 +15,157 @@ from pathlib import Path
 from motor import LockMotor
 from camera_stream import CameraStream
 from motion_detection import MotionDetector
+from continuous_recorder import ContinuousRecorder
+from motion_timeline import MotionTimeline, timeline_path_for
+from storage_writer import BackgroundWriter, remove_partial_files
+from ws_protocol import PROTOCOL_BINARY, PROTOCOL_JSON, MAX_BATCH_EVENTS, encode_binary, encode_json
+
+# Optional continuous recording (set CONTINUOUS_RECORDING=1 to enable)
+CONTINUOUS_RECORDING = os.environ.get("CONTINUOUS_RECORDING", "0") == "1"
+
+# Adapt motion thresholds to measured camera noise (set MOTION_AUTO_CALIBRATE=1 to enable)
+MOTION_AUTO_CALIBRATE = os.environ.get("MOTION_AUTO_CALIBRATE", "0") == "1"
+
+# Lock motor configuration
+MOTOR_BACKEND = os.environ.get("MOTOR_BACKEND") or None  # pigpio, rpi_gpio, simulated
+MOTOR_PROFILE = os.environ.get("MOTOR_PROFILE", "default")
+LOCKED_SENSOR_PIN = int(os.environ["LOCKED_SENSOR_PIN"]) if os.environ.get("LOCKED_SENSOR_PIN") else None
+UNLOCKED_SENSOR_PIN = int(os.environ["UNLOCKED_SENSOR_PIN"]) if os.environ.get("UNLOCKED_SENSOR_PIN") else None
+
+# Longest a ?wait= long-poll request is held open, in seconds
+MAX_LONG_POLL_SECONDS = 60
+
+# Binary WebSocket clients receive events batched over this window, in seconds
+WS_BATCH_WINDOW = 0.05
+
+# Maximum number of clips per /clips/timelines request
+MAX_TIMELINE_BATCH = 200
 
 # WebSocket connections manager
 class ConnectionManager:
     def __init__(self):
         self.active_connections: List[WebSocket] = []
+        self.protocols: Dict[WebSocket, str] = {}
+        self.pending: List[dict] = []
+        self.flush_task = None
 
-    async def connect(self, websocket: WebSocket):
+    async def connect(self, websocket: WebSocket, protocol: str = PROTOCOL_JSON):
         await websocket.accept()
         self.active_connections.append(websocket)
-        print(f"Client connected. Total connections: {len(self.active_connections)}")
+        self.protocols[websocket] = protocol
+        print(f"Client connected ({protocol}). Total connections: {len(self.active_connections)}")
 
     def disconnect(self, websocket: WebSocket):
-        self.active_connections.remove(websocket)
+        if websocket in self.active_connections:
+            self.active_connections.remove(websocket)
+        self.protocols.pop(websocket, None)
         print(f"Client disconnected. Total connections: {len(self.active_connections)}")
 
+    async def send(self, websocket: WebSocket, message: dict):
+        """Send one message immediately in the client's protocol"""
+        if self.protocols.get(websocket) == PROTOCOL_BINARY:
+            await websocket.send_bytes(encode_binary([message]))
+        else:
+            await websocket.send_text(encode_json(message))
+
     async def broadcast(self, message: dict):
-        for connection in self.active_connections:
+        """
+        Send a message to all clients
+        
+        JSON clients get it right away, encoded once for everyone. Binary
+        clients get it in the next batch, flushed after WS_BATCH_WINDOW.
+        """
+        has_binary_clients = False
+        text = None
+        for connection in list(self.active_connections):
+            if self.protocols.get(connection) == PROTOCOL_BINARY:
+                has_binary_clients = True
+                continue
+            if text is None:
+                text = encode_json(message)
             try:
-                await connection.send_json(message)
+                await connection.send_text(text)
             except Exception as e:
                 print(f"Error broadcasting to client: {e}")
+        
+        if has_binary_clients:
+            self.pending.append(message)
+            if self.flush_task is None:
+                self.flush_task = asyncio.create_task(self._flush_after(WS_BATCH_WINDOW))
+
+    async def _flush_after(self, delay: float):
+        # Stay registered until the queue is drained so only one flusher ever
+        # writes to the sockets; events broadcast mid-send join a later batch
+        try:
+            await asyncio.sleep(delay)
+            
+            while self.pending:
+                batch = self.pending[:MAX_BATCH_EVENTS]
+                del self.pending[:MAX_BATCH_EVENTS]
+                frame = encode_binary(batch)
+                for connection in list(self.active_connections):
+                    if self.protocols.get(connection) != PROTOCOL_BINARY:
+                        continue
+                    try:
+                        await connection.send_bytes(frame)
+                    except Exception as e:
+                        print(f"Error broadcasting to client: {e}")
+        finally:
+            self.flush_task = None
 
 manager = ConnectionManager()
 
+# Version tracking for conditional GET and long-poll
+# ETags include a per-process ID so versions from before a restart never match
+SERVER_INSTANCE_ID = os.urandom(4).hex()
+
+class VersionTracker:
+    def __init__(self, name: str):
+        self.name = name
+        self.version = 1
+        # Created on first wait so it binds to the server's event loop
+        self.changed = None
+        self.cached_body = None
+        self.cached_version = None
+
+    @property
+    def etag(self) -> str:
+        return f'"{self.name}-{SERVER_INSTANCE_ID}-{self.version}"'
+
+    def bump(self):
+        """Mark the resource as changed and wake any long-polling requests"""
+        self.version += 1
+        if self.changed:
+            self.changed.set()
+            self.changed = None
+
+    async def wait_for_change(self, timeout: float):
+        """Wait until the next bump() or until timeout expires"""
+        if self.changed is None:
+            self.changed = asyncio.Event()
+        try:
+            await asyncio.wait_for(self.changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    def body(self, build) -> bytes:
+        """Serialize the response once per version"""
+        if self.cached_version != self.version:
+            self.cached_body = json.dumps(build()).encode()
+            self.cached_version = self.version
+        return self.cached_body
+
+lock_state_version = VersionTracker("lock")
+activity_version = VersionTracker("activity")
+clips_version = VersionTracker("clips")
+clips_dir_mtime = None
+
 # Global components
 lock_motor = None
 camera_stream = None
 motion_detector = None
+continuous_recorder = None
+storage_writer = None
 activity_logs = []
 lock_state = {"isLocked": True, "timestamp": datetime.now().isoformat()}
 motion_task = None
@@ -57,8 +180,38 @@ def add_activity_log(action: str, user: Optional[str] = None, details: Optional[
         "details": details,
     }
     activity_logs.append(log)
+    activity_version.bump()
     return log
 
+def refresh_clips_version():
+    """Bump the clip catalog version if the clips directory changed"""
+    global clips_dir_mtime
+    try:
+        mtime = Path("clips").stat().st_mtime_ns
+    except FileNotFoundError:
+        mtime = None
+    if mtime != clips_dir_mtime:
+        clips_dir_mtime = mtime
+        clips_version.bump()
+
+async def conditional_response(request: Request, tracker: VersionTracker, build, wait: Optional[float]):
+    """
+    Return a cached JSON body with an ETag, or 304 if the client is up to date
+    
+    With ?wait=N and a current If-None-Match, the request is held until the
+    resource changes or N seconds pass.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    
+    if wait and if_none_match == tracker.etag:
+        await tracker.wait_for_change(min(wait, MAX_LONG_POLL_SECONDS))
+    
+    headers = {"ETag": tracker.etag, "Cache-Control": "no-cache"}
+    if if_none_match == tracker.etag:
+        return Response(status_code=304, headers=headers)
+    
+    return Response(content=tracker.body(build), media_type="application/json", headers=headers)
+
 async def motion_detection_task():
     """Background task for motion detection"""
     global motion_detector, manager
@@ -71,6 +224,8 @@ async def motion_detection_task():
                 # Record clip
                 clip_filename = motion_detector.record_clip()
                 
+                refresh_clips_version()
+                
                 # Log activity
                 add_activity_log(
                     "Motion detected",
@@ -93,7 +248,7 @@ async def motion_detection_task():
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Lifespan event handler for startup and shutdown"""
-    global lock_motor, camera_stream, motion_detector, motion_task
+    global lock_motor, camera_stream, motion_detector, continuous_recorder, storage_writer, motion_task
     
     # Startup
     print("Starting Smart Lock Entry API...")
@@ -101,12 +256,32 @@ async def lifespan(app: FastAPI):
     
     try:
         # Initialize components
-        lock_motor = LockMotor()
+        lock_motor = LockMotor(
+            backend=MOTOR_BACKEND,
+            profile=MOTOR_PROFILE,
+            locked_sensor_pin=LOCKED_SENSOR_PIN,
+            unlocked_sensor_pin=UNLOCKED_SENSOR_PIN,
+        )
         camera_stream = CameraStream()
-        motion_detector = MotionDetector()
         
         # Create clips directory if it doesn't exist
         Path("clips").mkdir(exist_ok=True)
+        remove_partial_files("clips")
+        
+        # Clips are staged in RAM and written in the background; wake clip
+        # long-pollers when a finished file is renamed into place
+        loop = asyncio.get_running_loop()
+        storage_writer = BackgroundWriter(
+            on_complete=lambda path: loop.call_soon_threadsafe(refresh_clips_version)
+        )
+        motion_detector = MotionDetector(auto_calibrate=MOTION_AUTO_CALIBRATE, writer=storage_writer)
+        
+        # Continuous recording shares the live stream's camera
+        if CONTINUOUS_RECORDING:
+            continuous_recorder = ContinuousRecorder(camera=camera_stream.camera)
+            if not continuous_recorder.start():
+                # Leave the endpoints returning 503 rather than recording nothing
+                continuous_recorder = None
         
         # Add initial activity log
         add_activity_log("System started", details="Smart Lock Entry system initialized")
@@ -132,12 +307,16 @@ async def lifespan(app: FastAPI):
             print("Motion detection task cancelled")
     
     # Cleanup components
+    if continuous_recorder:
+        continuous_recorder.cleanup()
     if camera_stream:
         camera_stream.cleanup()
     if lock_motor:
         lock_motor.cleanup()
     if motion_detector:
         motion_detector.cleanup()
+    if storage_writer:
+        storage_writer.cleanup()
     
     print("Shutdown complete")
 
@@ -151,6 +330,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],
 )
 
 # Pydantic models
@@ -173,6 +353,21 @@ class MotionClipResponse(BaseModel):
     timestamp: str
     duration: int
 
+class ClipTimelinesRequest(BaseModel):
+    filenames: List[str]
+
+class ClipTimelineResponse(BaseModel):
+    interval: float
+    energy: List[float]
+    boxes: List[Optional[List[float]]]
+    peakOffset: Optional[float] = None
+
+class RecordingSegmentResponse(BaseModel):
+    filename: str
+    start: str
+    end: str
+    size: int
+
 # API Endpoints
 
 @app.get("/")
@@ -186,9 +381,9 @@ async def root():
     }
 
 @app.get("/lock/state", response_model=LockStateResponse)
-async def get_lock_state():
-    """Get current lock state"""
-    return lock_state
+async def get_lock_state(request: Request, wait: Optional[float] = None):
+    """Get current lock state (supports If-None-Match and ?wait= long-poll)"""
+    return await conditional_response(request, lock_state_version, lambda: lock_state, wait)
 
 @app.post("/lock/command")
 async def set_lock_command(command: LockCommand):
@@ -201,24 +396,34 @@ async def set_lock_command(command: LockCommand):
     try:
         is_locked = command.command == "lock"
         
-        # Control the motor
+        # Control the motor off the event loop so other requests aren't blocked
         if lock_motor:
             if is_locked:
-                lock_motor.lock()
+                await asyncio.to_thread(lock_motor.lock)
             else:
-                lock_motor.unlock()
+                await asyncio.to_thread(lock_motor.unlock)
+            
+            # Position feedback may disagree with the command
+            is_locked = lock_motor.get_state()
         
         # Update state
         lock_state = {
             "isLocked": is_locked,
             "timestamp": datetime.now().isoformat(),
         }
+        lock_state_version.bump()
         
         # Log activity
-        add_activity_log(
-            action=f"Door {command.command}ed",
-            details=f"Lock state changed to {command.command}ed"
-        )
+        if is_locked == (command.command == "lock"):
+            add_activity_log(
+                action=f"Door {command.command}ed",
+                details=f"Lock state changed to {command.command}ed"
+            )
+        else:
+            add_activity_log(
+                action=f"Door {command.command} failed",
+                details="Bolt position sensor did not confirm the move"
+            )
         
         # Broadcast to all connected WebSocket clients
         await manager.broadcast({
@@ -233,6 +438,14 @@ async def set_lock_command(command: LockCommand):
         print(f"Error executing lock command: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/lock/metrics")
+async def get_lock_metrics():
+    """Get lock actuation timing metrics"""
+    if not lock_motor:
+        raise HTTPException(status_code=503, detail="Lock motor not initialized")
+    
+    return lock_motor.get_metrics()
+
 @app.get("/camera/live")
 async def get_camera_stream():
     """Get live MJPEG camera stream"""
@@ -248,9 +461,8 @@ async def get_camera_stream():
         print(f"Error streaming camera: {e}")
         raise HTTPException(status_code=500, detail="Camera stream unavailable")
 
-@app.get("/clips", response_model=List[MotionClipResponse])
-async def get_motion_clips():
-    """Get list of recorded motion clips"""
+def list_motion_clips():
+    """Scan the clips directory"""
     clips_dir = Path("clips")
     
     if not clips_dir.exists():
@@ -269,6 +481,51 @@ async def get_motion_clips():
     clips.sort(key=lambda x: x["timestamp"], reverse=True)
     return clips
 
+@app.get("/storage/metrics")
+async def get_storage_metrics():
+    """Get clip write throughput and backlog metrics"""
+    if not storage_writer:
+        raise HTTPException(status_code=503, detail="Storage writer not initialized")
+    
+    return storage_writer.get_metrics()
+
+@app.get("/motion/calibration")
+async def get_motion_calibration():
+    """Get current motion thresholds and auto-calibration state"""
+    if not motion_detector:
+        raise HTTPException(status_code=503, detail="Motion detector not initialized")
+    
+    return motion_detector.get_calibration()
+
+@app.get("/clips", response_model=List[MotionClipResponse])
+async def get_motion_clips(request: Request, wait: Optional[float] = None):
+    """Get list of recorded motion clips (supports If-None-Match and ?wait= long-poll)"""
+    # Catch clips added or removed outside the server
+    refresh_clips_version()
+    return await conditional_response(request, clips_version, list_motion_clips, wait)
+
+@app.post("/clips/timelines", response_model=Dict[str, Optional[ClipTimelineResponse]])
+async def get_clip_timelines(request: ClipTimelinesRequest):
+    """Get motion activity timelines for many clips in one request"""
+    if len(request.filenames) > MAX_TIMELINE_BATCH:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many clips requested (max {MAX_TIMELINE_BATCH})"
+        )
+    
+    clips_dir = Path("clips")
+    timelines = {}
+    for filename in request.filenames:
+        # Only look up plain filenames inside the clips directory
+        if Path(filename).name != filename:
+            timelines[filename] = None
+            continue
+        
+        timeline = MotionTimeline.load(timeline_path_for(clips_dir / filename))
+        timelines[filename] = timeline.to_dict() if timeline else None
+    
+    return timelines
+
 @app.get("/clips/{filename}")
 async def get_clip_file(filename: str):
     """Download a specific motion clip"""
@@ -279,20 +536,62 @@ async def get_clip_file(filename: str):
     
     return FileResponse(clip_path, media_type="video/mp4")
 
+@app.get("/recordings", response_model=List[RecordingSegmentResponse])
+async def get_recordings():
+    """Get list of continuous recording segments"""
+    if not continuous_recorder:
+        raise HTTPException(status_code=503, detail="Continuous recording not enabled")
+    
+    return continuous_recorder.list_segments()
+
+@app.get("/recordings/export")
+async def export_recording(start: str, end: str):
+    """Export or stream an arbitrary time range from continuous recording"""
+    if not continuous_recorder:
+        raise HTTPException(status_code=503, detail="Continuous recording not enabled")
+    
+    try:
+        start_time = datetime.fromisoformat(start).timestamp()
+        end_time = datetime.fromisoformat(end).timestamp()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid timestamp. Use ISO 8601 format")
+    
+    if end_time <= start_time:
+        raise HTTPException(status_code=400, detail="End must be after start")
+    
+    ranges = continuous_recorder.find_range(start_time, end_time)
+    if not ranges:
+        raise HTTPException(status_code=404, detail="No recording in requested range")
+    
+    filename = datetime.fromtimestamp(start_time).strftime("recording_%Y%m%d_%H%M%S.h264")
+    return StreamingResponse(
+        continuous_recorder.export_range(ranges),
+        media_type="video/h264",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
 @app.get("/activity", response_model=List[ActivityLogResponse])
-async def get_activity_logs():
-    """Get activity logs"""
+async def get_activity_logs(request: Request, wait: Optional[float] = None):
+    """Get activity logs (supports If-None-Match and ?wait= long-poll)"""
     # Return most recent logs first
-    return list(reversed(activity_logs[-50:]))  # Last 50 logs
+    return await conditional_response(
+        request, activity_version, lambda: list(reversed(activity_logs[-50:])), wait  # Last 50 logs
+    )
 
 @app.websocket("/ws/lock")
-async def websocket_lock_state(websocket: WebSocket):
-    """WebSocket endpoint for real-time lock state updates"""
-    await manager.connect(websocket)
+async def websocket_lock_state(websocket: WebSocket, protocol: str = PROTOCOL_JSON):
+    """
+    WebSocket endpoint for real-time lock state updates
+    
+    Connect with ?protocol=binary for batched binary frames (see ws_protocol.py).
+    """
+    if protocol not in (PROTOCOL_JSON, PROTOCOL_BINARY):
+        protocol = PROTOCOL_JSON
+    await manager.connect(websocket, protocol)
     
     try:
         # Send current state immediately upon connection
-        await websocket.send_json({
+        await manager.send(websocket, {
             "type": "lock_state",
             "isLocked": lock_state["isLocked"],
             "timestamp": lock_state["timestamp"],
@@ -301,10 +600,12 @@ async def websocket_lock_state(websocket: WebSocket):
         # Keep connection alive
         while True:
             # Wait for messages from client (ping/pong)
-            data = await websocket.receive_text()
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
             
             # Echo back to keep connection alive
-            if data == "ping":
+            if message.get("text") == "ping":
                 await websocket.send_text("pong")
     
     except WebSocketDisconnect:
@@ -0,0 +1,258 @@
+
+"""
+SD-Card Friendly Storage Writer
+Stages file data in RAM and writes it from a background thread in large
+aligned sequential chunks, renaming each file into place once complete
+"""
+
+import io
+import os
+import queue
+import threading
+import time
+from pathlib import Path
+
+# Every write except a file's last is exactly this size, at an aligned offset
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+DEFAULT_MAX_BUFFERED_BYTES = 32 * 1024 * 1024
+
+
+def partial_path_for(path):
+    """Hidden temporary name used while a file is being written"""
+    path = Path(path)
+    return path.with_name(f".{path.name}.part")
+
+
+def remove_partial_files(directory):
+    """Delete .part files left behind by an interrupted run"""
+    for path in Path(directory).glob(".*.part"):
+        try:
+            path.unlink()
+            print(f"Removed incomplete file: {path.name}")
+        except OSError as e:
+            print(f"Error removing incomplete file {path}: {e}")
+
+
+class StagedFile(io.BufferedIOBase):
+    """Write-only file object that hands full chunks to a BackgroundWriter"""
+
+    def __init__(self, writer, path):
+        super().__init__()
+        self.writer = writer
+        self.path = Path(path)
+        self.buffer = bytearray()
+        self.done = threading.Event()
+        self.error = None
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        if self.closed:
+            raise ValueError("write to closed file")
+
+        self.buffer += data
+        chunk_size = self.writer.chunk_size
+        while len(self.buffer) >= chunk_size:
+            chunk = bytes(self.buffer[:chunk_size])
+            del self.buffer[:chunk_size]
+            self.writer.submit(self, chunk, False)
+        return len(data)
+
+    def flush(self):
+        # Data reaches the card in whole chunks from the writer thread
+        pass
+
+    def close(self):
+        """Queue the remaining data and the final rename (does not wait)"""
+        if self.closed:
+            return
+        self.writer.submit(self, bytes(self.buffer), True)
+        self.buffer = bytearray()
+        super().close()
+
+    def wait(self, timeout=None):
+        """Wait until the file has been renamed into place"""
+        return self.done.wait(timeout)
+
+
+class BackgroundWriter:
+    def __init__(self, chunk_size=DEFAULT_CHUNK_SIZE, max_buffered_bytes=DEFAULT_MAX_BUFFERED_BYTES,
+                 on_complete=None):
+        """
+        Initialize background writer
+
+        Args:
+            chunk_size: Size of each sequential write in bytes
+            max_buffered_bytes: RAM limit for data waiting to be written;
+                producers block once it is reached
+            on_complete: Optional callback(path) run on the writer thread
+                after a file is renamed into place
+        """
+        self.chunk_size = chunk_size
+        self.max_buffered_bytes = max_buffered_bytes
+        self.on_complete = on_complete
+
+        self.queue = queue.Queue()
+        self.thread = None
+        self.condition = threading.Condition()
+        self.open_files = {}
+
+        # Metrics
+        self.backlog_bytes = 0
+        self.peak_backlog_bytes = 0
+        self.bytes_written = 0
+        self.write_seconds = 0.0
+        self.files_completed = 0
+        self.files_failed = 0
+        self.producer_stalls = 0
+        self.stall_seconds = 0.0
+
+    def _ensure_started(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+
+    def open(self, path):
+        """
+        Open a file for staged writing
+
+        The data is written to a hidden .part file and renamed to `path`
+        only after the last chunk is on the card, so readers never see a
+        half-written file.
+        """
+        self._ensure_started()
+        return StagedFile(self, path)
+
+    def write_file(self, path, data):
+        """Write a complete small file through the staged path"""
+        staged = self.open(path)
+        staged.write(data)
+        staged.close()
+        return staged
+
+    def submit(self, staged, data, final):
+        """Queue a chunk, blocking if the RAM budget is exhausted"""
+        with self.condition:
+            if self.backlog_bytes + len(data) > self.max_buffered_bytes and self.backlog_bytes > 0:
+                self.producer_stalls += 1
+                start = time.perf_counter()
+                while self.backlog_bytes + len(data) > self.max_buffered_bytes and self.backlog_bytes > 0:
+                    self.condition.wait()
+                self.stall_seconds += time.perf_counter() - start
+
+            self.backlog_bytes += len(data)
+            self.peak_backlog_bytes = max(self.peak_backlog_bytes, self.backlog_bytes)
+
+        self.queue.put((staged, data, final))
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+
+            staged, data, final = item
+            try:
+                self._write(staged, data, final)
+            except OSError as e:
+                print(f"Error writing {staged.path}: {e}")
+                staged.error = e
+                self._abort(staged)
+            finally:
+                with self.condition:
+                    self.backlog_bytes -= len(data)
+                    self.condition.notify_all()
+
+    def _write(self, staged, data, final):
+        if staged.error is not None:
+            return
+
+        f = self.open_files.get(staged)
+        if f is None:
+            f = open(partial_path_for(staged.path), "wb", buffering=0)
+            self.open_files[staged] = f
+
+        start = time.perf_counter()
+        if data:
+            f.write(data)
+        if final:
+            os.fsync(f.fileno())
+            f.close()
+            del self.open_files[staged]
+            os.replace(partial_path_for(staged.path), staged.path)
+        self.write_seconds += time.perf_counter() - start
+        self.bytes_written += len(data)
+
+        if final:
+            self.files_completed += 1
+            staged.done.set()
+            if self.on_complete:
+                try:
+                    self.on_complete(staged.path)
+                except Exception as e:
+                    print(f"Error in write completion callback: {e}")
+
+    def _abort(self, staged):
+        f = self.open_files.pop(staged, None)
+        if f is not None:
+            try:
+                f.close()
+            except OSError:
+                pass
+        try:
+            partial_path_for(staged.path).unlink()
+        except OSError:
+            pass
+        self.files_failed += 1
+        staged.done.set()
+
+    def get_metrics(self):
+        """Get write throughput and backlog metrics"""
+        with self.condition:
+            backlog = self.backlog_bytes
+        return {
+            "bytesWritten": self.bytes_written,
+            "writeSeconds": round(self.write_seconds, 3),
+            "throughputMBps": round(self.bytes_written / self.write_seconds / 1e6, 2)
+            if self.write_seconds else None,
+            "backlogBytes": backlog,
+            "peakBacklogBytes": self.peak_backlog_bytes,
+            "maxBufferedBytes": self.max_buffered_bytes,
+            "chunkSize": self.chunk_size,
+            "openFiles": len(self.open_files),
+            "filesCompleted": self.files_completed,
+            "filesFailed": self.files_failed,
+            "producerStalls": self.producer_stalls,
+            "stallSeconds": round(self.stall_seconds, 3),
+        }
+
+    def stop(self, timeout=30):
+        """Flush everything queued and stop the writer thread"""
+        if self.thread is None:
+            return
+        self.queue.put(None)
+        self.thread.join(timeout)
+        self.thread = None
+
+    def cleanup(self):
+        """Cleanup resources"""
+        print("Flushing storage writer...")
+        self.stop()
+
+# Example usage
+if __name__ == "__main__":
+    writer = BackgroundWriter()
+    target = Path("clips") / "writer_test.bin"
+    target.parent.mkdir(exist_ok=True)
+
+    try:
+        staged = writer.open(target)
+        for _ in range(200):
+            staged.write(os.urandom(64 * 1024))  # ~12.5 MB in encoder-sized pieces
+        staged.close()
+        staged.wait()
+        print(writer.get_metrics())
+    finally:
+        writer.cleanup()
+        target.unlink(missing_ok=True)
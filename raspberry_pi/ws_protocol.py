@@ -0,0 +1,116 @@
+
+"""
+WebSocket Message Encoding
+JSON text messages (default) and a compact batched binary layout
+
+Binary frame layout (little-endian):
+    header:  version u8, event count u16
+    events:  type u8, followed by
+        LOCK_STATE       isLocked u8, timestamp f64 (UNIX seconds)
+        MOTION_DETECTED  timestamp f64, clip name length u16, clip name utf-8
+        JSON             length u32, JSON utf-8 (any other message)
+"""
+
+import json
+import struct
+from datetime import datetime
+
+PROTOCOL_JSON = "json"
+PROTOCOL_BINARY = "binary"
+
+BINARY_VERSION = 1
+
+EVENT_LOCK_STATE = 1
+EVENT_MOTION_DETECTED = 2
+EVENT_JSON = 255
+
+FRAME_HEADER = struct.Struct("<BH")
+EVENT_TYPE = struct.Struct("<B")
+LOCK_STATE = struct.Struct("<Bd")
+MOTION_DETECTED = struct.Struct("<dH")
+JSON_LENGTH = struct.Struct("<I")
+
+# Largest number of events packed into one binary frame
+MAX_BATCH_EVENTS = 0xFFFF
+
+
+def _timestamp(value):
+    """Convert an ISO timestamp string to UNIX seconds"""
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except (TypeError, ValueError):
+        return datetime.now().timestamp()
+
+
+def encode_json(message):
+    """Encode a message as JSON text"""
+    return json.dumps(message, separators=(",", ":"), ensure_ascii=False)
+
+
+def encode_event(message):
+    """Encode a single message as a binary event"""
+    kind = message.get("type")
+
+    if kind == "lock_state" and set(message) <= {"type", "isLocked", "timestamp"}:
+        return EVENT_TYPE.pack(EVENT_LOCK_STATE) + LOCK_STATE.pack(
+            1 if message["isLocked"] else 0, _timestamp(message.get("timestamp"))
+        )
+
+    if kind == "motion_detected" and set(message) <= {"type", "clip", "timestamp"}:
+        clip = (message.get("clip") or "").encode()
+        return (
+            EVENT_TYPE.pack(EVENT_MOTION_DETECTED)
+            + MOTION_DETECTED.pack(_timestamp(message.get("timestamp")), len(clip))
+            + clip
+        )
+
+    payload = json.dumps(message).encode()
+    return EVENT_TYPE.pack(EVENT_JSON) + JSON_LENGTH.pack(len(payload)) + payload
+
+
+def encode_binary(messages):
+    """Encode a batch of messages as one binary frame"""
+    return FRAME_HEADER.pack(BINARY_VERSION, len(messages)) + b"".join(
+        encode_event(message) for message in messages
+    )
+
+
+def decode_binary(data):
+    """Decode a binary frame back into messages (used by the benchmark)"""
+    version, count = FRAME_HEADER.unpack_from(data, 0)
+    if version != BINARY_VERSION:
+        raise ValueError(f"Unsupported binary protocol version {version}")
+
+    offset = FRAME_HEADER.size
+    messages = []
+    for _ in range(count):
+        (kind,) = EVENT_TYPE.unpack_from(data, offset)
+        offset += EVENT_TYPE.size
+
+        if kind == EVENT_LOCK_STATE:
+            is_locked, timestamp = LOCK_STATE.unpack_from(data, offset)
+            offset += LOCK_STATE.size
+            messages.append({
+                "type": "lock_state",
+                "isLocked": bool(is_locked),
+                "timestamp": datetime.fromtimestamp(timestamp).isoformat(),
+            })
+        elif kind == EVENT_MOTION_DETECTED:
+            timestamp, length = MOTION_DETECTED.unpack_from(data, offset)
+            offset += MOTION_DETECTED.size
+            clip = data[offset:offset + length].decode()
+            offset += length
+            messages.append({
+                "type": "motion_detected",
+                "timestamp": datetime.fromtimestamp(timestamp).isoformat(),
+                "clip": clip,
+            })
+        elif kind == EVENT_JSON:
+            (length,) = JSON_LENGTH.unpack_from(data, offset)
+            offset += JSON_LENGTH.size
+            messages.append(json.loads(data[offset:offset + length]))
+            offset += length
+        else:
+            raise ValueError(f"Unknown event type {kind}")
+
+    return messages
@@ -1,5 +1,17 @@
 
-import { LockState, ActivityLog, MotionClip } from '../types';
+import { LockState, ActivityLog, MotionClip, ClipTimeline } from '../types';
+
+// Matches MAX_TIMELINE_BATCH in raspberry_pi/server.py
+const TIMELINE_BATCH_SIZE = 200;
+
+interface CachedResponse {
+  etag: string;
+  body: unknown;
+}
+
+// Shared by every LockApi instance so screens that recreate the client
+// still send If-None-Match. Keyed by full URL.
+const responseCache = new Map<string, CachedResponse>();
 
 export class LockApi {
   private baseUrl: string;
@@ -8,19 +20,57 @@ export class LockApi {
     this.baseUrl = baseUrl;
   }
 
+  // GET with If-None-Match; a 304 returns the cached body. With waitSeconds the
+  // server holds the request until the resource changes (long-poll).
+  private async conditionalGet<T>(path: string, waitSeconds?: number): Promise<T | null> {
+    const cacheKey = `${this.baseUrl}${path}`;
+    const cached = responseCache.get(cacheKey);
+    const url = waitSeconds && cached ? `${cacheKey}?wait=${waitSeconds}` : cacheKey;
+    const response = await fetch(url, {
+      headers: cached ? { 'If-None-Match': cached.etag } : {},
+    });
+
+    if (response.status === 304 && cached) {
+      return cached.body as T;
+    }
+    if (!response.ok) {
+      return null;
+    }
+
+    const body = await response.json();
+    const etag = response.headers.get('ETag');
+    if (etag) {
+      responseCache.set(cacheKey, { etag, body });
+    }
+    return body as T;
+  }
+
   async getLockState(): Promise<LockState> {
     try {
-      const response = await fetch(`${this.baseUrl}/lock/state`);
-      if (!response.ok) {
+      const state = await this.conditionalGet<LockState>('/lock/state');
+      if (!state) {
         throw new Error('Failed to get lock state');
       }
-      return await response.json();
+      return state;
     } catch (error) {
       console.log('Error getting lock state:', error);
       throw error;
     }
   }
 
+  async waitForLockState(timeoutSeconds: number = 30): Promise<LockState> {
+    try {
+      const state = await this.conditionalGet<LockState>('/lock/state', timeoutSeconds);
+      if (!state) {
+        throw new Error('Failed to wait for lock state');
+      }
+      return state;
+    } catch (error) {
+      console.log('Error waiting for lock state:', error);
+      throw error;
+    }
+  }
+
   async setLockState(isLocked: boolean): Promise<void> {
     try {
       const response = await fetch(`${this.baseUrl}/lock/command`, {
@@ -42,11 +92,11 @@ export class LockApi {
 
   async getActivityLogs(): Promise<ActivityLog[]> {
     try {
-      const response = await fetch(`${this.baseUrl}/activity`);
-      if (!response.ok) {
+      const logs = await this.conditionalGet<ActivityLog[]>('/activity');
+      if (!logs) {
         throw new Error('Failed to get activity logs');
       }
-      return await response.json();
+      return logs;
     } catch (error) {
       console.log('Error getting activity logs:', error);
       throw error;
@@ -55,17 +105,42 @@ export class LockApi {
 
   async getMotionClips(): Promise<MotionClip[]> {
     try {
-      const response = await fetch(`${this.baseUrl}/clips`);
-      if (!response.ok) {
+      const clips = await this.conditionalGet<MotionClip[]>('/clips');
+      if (!clips) {
         throw new Error('Failed to get motion clips');
       }
-      return await response.json();
+      return clips;
     } catch (error) {
       console.log('Error getting motion clips:', error);
       throw error;
     }
   }
 
+  async getClipTimelines(filenames: string[]): Promise<Record<string, ClipTimeline | null>> {
+    try {
+      // The server caps each request at TIMELINE_BATCH_SIZE clips
+      const timelines: Record<string, ClipTimeline | null> = {};
+      for (let i = 0; i < filenames.length; i += TIMELINE_BATCH_SIZE) {
+        const response = await fetch(`${this.baseUrl}/clips/timelines`, {
+          method: 'POST',
+          headers: {
+            'Content-Type': 'application/json',
+          },
+          body: JSON.stringify({ filenames: filenames.slice(i, i + TIMELINE_BATCH_SIZE) }),
+        });
+
+        if (!response.ok) {
+          throw new Error('Failed to get clip timelines');
+        }
+        Object.assign(timelines, await response.json());
+      }
+      return timelines;
+    } catch (error) {
+      console.log('Error getting clip timelines:', error);
+      throw error;
+    }
+  }
+
   getClipUrl(filename: string): string {
     return `${this.baseUrl}/clips/${filename}`;
   }
@@ -0,0 +1,57 @@
+
+// Decoder for the batched binary /ws/lock protocol (see raspberry_pi/ws_protocol.py)
+
+const BINARY_VERSION = 1;
+const EVENT_LOCK_STATE = 1;
+const EVENT_MOTION_DETECTED = 2;
+const EVENT_JSON = 255;
+
+export type LockStateMessage = { type: 'lock_state'; isLocked: boolean; timestamp: string };
+export type MotionDetectedMessage = { type: 'motion_detected'; timestamp: string; clip: string };
+
+export type WebSocketMessage =
+  | LockStateMessage
+  | MotionDetectedMessage
+  | { type: string; [key: string]: unknown };
+
+const textDecoder = new TextDecoder();
+
+export function decodeBinaryMessages(buffer: ArrayBuffer): WebSocketMessage[] {
+  const view = new DataView(buffer);
+  const version = view.getUint8(0);
+  if (version !== BINARY_VERSION) {
+    throw new Error(`Unsupported binary protocol version ${version}`);
+  }
+
+  const count = view.getUint16(1, true);
+  let offset = 3;
+  const messages: WebSocketMessage[] = [];
+
+  for (let i = 0; i < count; i++) {
+    const kind = view.getUint8(offset);
+    offset += 1;
+
+    if (kind === EVENT_LOCK_STATE) {
+      const isLocked = view.getUint8(offset) === 1;
+      const timestamp = new Date(view.getFloat64(offset + 1, true) * 1000).toISOString();
+      offset += 9;
+      messages.push({ type: 'lock_state', isLocked, timestamp });
+    } else if (kind === EVENT_MOTION_DETECTED) {
+      const timestamp = new Date(view.getFloat64(offset, true) * 1000).toISOString();
+      const length = view.getUint16(offset + 8, true);
+      offset += 10;
+      const clip = textDecoder.decode(new Uint8Array(buffer, offset, length));
+      offset += length;
+      messages.push({ type: 'motion_detected', timestamp, clip });
+    } else if (kind === EVENT_JSON) {
+      const length = view.getUint32(offset, true);
+      offset += 4;
+      messages.push(JSON.parse(textDecoder.decode(new Uint8Array(buffer, offset, length))));
+      offset += length;
+    } else {
+      throw new Error(`Unknown event type ${kind}`);
+    }
+  }
+
+  return messages;
+}
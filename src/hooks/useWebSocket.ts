@@ -1,14 +1,17 @@
 
 import { useEffect, useRef, useState, useCallback } from 'react';
 import { LockState } from '../types';
+import { decodeBinaryMessages, LockStateMessage, WebSocketMessage } from '../api/wsProtocol';
 
 interface UseWebSocketProps {
   url: string;
   enabled: boolean;
   onLockStateChange?: (state: LockState) => void;
+  // Batched binary frames; older servers ignore the parameter and send JSON
+  binary?: boolean;
 }
 
-export const useWebSocket = ({ url, enabled, onLockStateChange }: UseWebSocketProps) => {
+export const useWebSocket = ({ url, enabled, onLockStateChange, binary = true }: UseWebSocketProps) => {
   const [isConnected, setIsConnected] = useState(false);
   const [lockState, setLockState] = useState<LockState | null>(null);
   const wsRef = useRef<WebSocket | null>(null);
@@ -25,7 +28,8 @@ export const useWebSocket = ({ url, enabled, onLockStateChange }: UseWebSocketPr
       const wsUrl = url.replace('http://', 'ws://').replace('https://', 'wss://');
       console.log('Connecting to WebSocket:', wsUrl);
       
-      const ws = new WebSocket(`${wsUrl}/ws/lock`);
+      const ws = new WebSocket(binary ? `${wsUrl}/ws/lock?protocol=binary` : `${wsUrl}/ws/lock`);
+      ws.binaryType = 'arraybuffer';
       
       ws.onopen = () => {
         console.log('WebSocket connected');
@@ -35,13 +39,19 @@ export const useWebSocket = ({ url, enabled, onLockStateChange }: UseWebSocketPr
 
       ws.onmessage = (event) => {
         try {
-          const data = JSON.parse(event.data);
-          console.log('WebSocket message received:', data);
-          
-          if (data.type === 'lock_state') {
+          const messages: WebSocketMessage[] = typeof event.data === 'string'
+            ? [JSON.parse(event.data)]
+            : decodeBinaryMessages(event.data);
+          console.log('WebSocket messages received:', messages);
+
+          // Only the latest lock state in a batch matters
+          const latest = messages
+            .filter((data): data is LockStateMessage => data.type === 'lock_state')
+            .pop();
+          if (latest) {
             const newState: LockState = {
-              isLocked: data.isLocked,
-              timestamp: data.timestamp,
+              isLocked: latest.isLocked,
+              timestamp: latest.timestamp,
             };
             setLockState(newState);
             onLockStateChange?.(newState);
@@ -75,7 +85,7 @@ export const useWebSocket = ({ url, enabled, onLockStateChange }: UseWebSocketPr
     } catch (error) {
       console.log('Error creating WebSocket:', error);
     }
-  }, [url, enabled, onLockStateChange]);
+  }, [url, enabled, onLockStateChange, binary]);
 
   const disconnect = useCallback(() => {
     if (reconnectTimeoutRef.current) {
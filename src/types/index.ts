@@ -25,6 +25,13 @@ export interface MotionClip {
   thumbnailUrl?: string;
 }
 
+export interface ClipTimeline {
+  interval: number;
+  energy: number[];
+  boxes: (number[] | null)[];
+  peakOffset: number | null;
+}
+
 export interface DeviceSettings {
   piBaseUrl: string;
   cameraEnabled: boolean;